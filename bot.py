@@ -1,15 +1,34 @@
 import discord
 from discord.ext import commands, tasks
 import asyncio
-import json
 import datetime
 import logging
 import os
-from typing import Optional, List, Dict
+import re
+import time
+from typing import Optional, List, Dict, Deque
 import aiohttp
-import sqlite3
-from dataclasses import dataclass
-from enum import Enum
+import aiosqlite
+import orjson
+import itertools
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from enum import Enum, IntFlag
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+SUSPICIOUS_WORDS = [
+    "hack", "cheat", "exploit", "crack", "bypass",
+    "ddos", "bot", "script", "auto", "macro"
+]
+
+class ContentFlag(IntFlag):
+    NONE = 0
+    SUSPICIOUS = 1
+    INVITE = 2
 
 class SecurityLevel(Enum):
     LOW = "low"
@@ -17,7 +36,7 @@ class SecurityLevel(Enum):
     HIGH = "high"
     CRITICAL = "critical"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SecurityEvent:
     timestamp: datetime.datetime
     user_id: int
@@ -28,6 +47,12 @@ class SecurityEvent:
     channel_id: Optional[int] = None
     message_id: Optional[int] = None
 
+@dataclass(slots=True)
+class UserSuspicion:
+    total_points: int = 0
+    reasons: Deque[Dict] = field(default_factory=lambda: deque(maxlen=50))
+    recent_messages: Deque[float] = field(default_factory=lambda: deque(maxlen=5))
+
 class XillenSecurityBot(commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
@@ -42,20 +67,26 @@ class XillenSecurityBot(commands.Bot):
         )
         
         self.config = self.load_config()
-        self.security_events: List[SecurityEvent] = []
-        self.suspicious_users: Dict[int, Dict] = {}
+        self._apply_config()
+        self._log_channel: Optional[discord.TextChannel] = None
+        self.security_events: Deque[SecurityEvent] = deque(maxlen=1000)
+        self._event_type_counts: Counter = Counter()
+        self.suspicious_users: Dict[int, UserSuspicion] = {}
         self.db = Database()
+        self._msg_q: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._dropped_messages = 0
+        self._closing = False
         self.logger = self.setup_logging()
-        
-        self.add_cog(SecurityCommands(self))
-        self.add_cog(ModerationCommands(self))
-        self.add_cog(MonitoringCommands(self))
-        self.add_cog(AdminCommands(self))
+        self._content_re = re.compile(
+            r"(?P<INVITE>discord(?:\.gg/|app\.com/invite/))"
+            r"|(?P<SUSPICIOUS>" + "|".join(map(re.escape, SUSPICIOUS_WORDS)) + ")"
+        )
         
     def load_config(self) -> dict:
         try:
-            with open('config.json', 'r') as f:
-                return json.load(f)
+            with open('config.json', 'rb') as f:
+                return orjson.loads(f.read())
         except FileNotFoundError:
             config = {
                 "token": "YOUR_BOT_TOKEN_HERE",
@@ -66,10 +97,19 @@ class XillenSecurityBot(commands.Bot):
                 "suspicious_threshold": 3,
                 "welcome_message": True
             }
-            with open('config.json', 'w') as f:
-                json.dump(config, f, indent=2)
+            with open('config.json', 'wb') as f:
+                f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
             return config
     
+    def _apply_config(self):
+        self.welcome_message: bool = self.config.get("welcome_message", True)
+        self.auto_moderation: bool = self.config.get("auto_moderation", True)
+        self.suspicious_threshold: int = self.config.get("suspicious_threshold", 3)
+        self.log_channel_id: Optional[int] = self.config.get("log_channel_id")
+    
+    def resolve_log_channel(self):
+        self._log_channel = self.get_channel(self.log_channel_id) if self.log_channel_id else None
+    
     def setup_logging(self) -> logging.Logger:
         logger = logging.getLogger('XillenSecurityBot')
         logger.setLevel(logging.INFO)
@@ -85,6 +125,31 @@ class XillenSecurityBot(commands.Bot):
         await self.db.init()
         self.logger.info("Database initialized")
         
+        await self.add_cog(SecurityCommands(self))
+        await self.add_cog(ModerationCommands(self))
+        await self.add_cog(MonitoringCommands(self))
+        await self.add_cog(AdminCommands(self))
+        
+        self._msg_q = asyncio.Queue(maxsize=1024)
+        self._workers = [asyncio.create_task(self._message_worker()) for _ in range(8)]
+    
+    async def close(self):
+        self._closing = True
+        
+        if self._msg_q is not None:
+            try:
+                await asyncio.wait_for(self._msg_q.join(), timeout=10)
+            except asyncio.TimeoutError:
+                self.logger.warning(f"Shutting down with {self._msg_q.qsize()} unprocessed messages")
+        
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        
+        await super().close()
+        await self.db.close()
+        
     async def on_ready(self):
         self.logger.info(f'Logged in as {self.user.name} ({self.user.id})')
         print("╔══════════════════════════════════════════════════════════════╗")
@@ -99,11 +164,12 @@ class XillenSecurityBot(commands.Bot):
                 name="за безопасностью сервера"
             )
         )
+        self.resolve_log_channel()
         
         self.monitoring_task.start()
     
     async def on_member_join(self, member: discord.Member):
-        if self.config.get("welcome_message", True):
+        if self.welcome_message:
             await self.send_welcome_message(member)
         
         await self.check_new_member(member)
@@ -131,61 +197,74 @@ class XillenSecurityBot(commands.Bot):
         )
     
     async def on_message(self, message: discord.Message):
-        if message.author.bot:
+        if message.author.bot or self._closing:
             return
         
-        await self.process_message(message)
-        await self.bot.process_commands(message)
+        try:
+            self._msg_q.put_nowait((message, time.monotonic()))
+        except asyncio.QueueFull:
+            self._dropped_messages += 1
+            self.logger.warning(f"Message queue full, dropped message {message.id} ({self._dropped_messages} total)")
+        
+        await self.process_commands(message)
     
-    async def process_message(self, message: discord.Message):
-        content = message.content.lower()
+    async def _message_worker(self):
+        while True:
+            message, received_at = await self._msg_q.get()
+            try:
+                await asyncio.wait_for(self.process_message(message, received_at), timeout=5)
+            except asyncio.TimeoutError:
+                self.logger.warning(f"Processing message {message.id} timed out")
+            except Exception as e:
+                self.logger.error(f"Failed to process message {message.id}: {e}")
+            finally:
+                self._msg_q.task_done()
+    
+    async def process_message(self, message: discord.Message, received_at: float):
+        await self.log_message_event(message)
+        
+        flags = self.classify(message.content.lower())
         user_id = message.author.id
         
-        if await self.is_suspicious_content(content):
+        if flags & ContentFlag.SUSPICIOUS:
             await self.handle_suspicious_message(message)
             await self.add_suspicion(user_id, "suspicious_content", 1)
         
-        if await self.is_spam(message):
+        if await self.is_spam(message, received_at):
             await self.handle_spam(message)
             await self.add_suspicion(user_id, "spam", 2)
         
-        if await self.contains_invite(content):
+        if flags & ContentFlag.INVITE:
             await self.handle_invite(message)
             await self.add_suspicion(user_id, "invite_link", 3)
-        
-        await self.log_message_event(message)
     
-    async def is_suspicious_content(self, content: str) -> bool:
-        suspicious_words = [
-            "hack", "cheat", "exploit", "crack", "bypass",
-            "ddos", "bot", "script", "auto", "macro"
-        ]
-        
-        return any(word in content for word in suspicious_words)
+    def classify(self, content_lower: str) -> ContentFlag:
+        flags = ContentFlag.NONE
+        for match in self._content_re.finditer(content_lower):
+            flags |= ContentFlag[match.lastgroup]
+            if flags == ContentFlag.SUSPICIOUS | ContentFlag.INVITE:
+                break
+        return flags
     
-    async def is_spam(self, message: discord.Message) -> bool:
+    async def is_spam(self, message: discord.Message, received_at: float) -> bool:
         user_id = message.author.id
         
         if user_id not in self.suspicious_users:
             return False
         
-        user_data = self.suspicious_users[user_id]
-        recent_messages = user_data.get("recent_messages", [])
+        recent_messages = self.suspicious_users[user_id].recent_messages
         
-        now = datetime.datetime.now()
-        recent_messages = [msg for msg in recent_messages if (now - msg).seconds < 10]
+        while recent_messages and received_at - recent_messages[0] >= 10:
+            recent_messages.popleft()
         
-        if len(recent_messages) >= 5:
-            return True
-        
-        recent_messages.append(now)
-        user_data["recent_messages"] = recent_messages
-        return False
-    
-    async def contains_invite(self, content: str) -> bool:
-        return "discord.gg/" in content or "discordapp.com/invite/" in content
+        is_spam = len(recent_messages) >= 5
+        recent_messages.append(received_at)
+        return is_spam
     
     async def handle_suspicious_message(self, message: discord.Message):
+        if self._log_channel is None:
+            return
+        
         embed = discord.Embed(
             title="⚠️ Подозрительное сообщение",
             description="Обнаружено подозрительное содержимое",
@@ -199,56 +278,57 @@ class XillenSecurityBot(commands.Bot):
         await self.send_security_alert(embed)
     
     async def handle_spam(self, message: discord.Message):
-        embed = discord.Embed(
-            title="🚫 Спам обнаружен",
-            description="Пользователь отправляет слишком много сообщений",
-            color=discord.Color.red(),
-            timestamp=datetime.datetime.now()
-        )
-        embed.add_field(name="Автор", value=message.author.mention, inline=True)
-        embed.add_field(name="Канал", value=message.channel.mention, inline=True)
-        
-        await self.send_security_alert(embed)
+        if self._log_channel is not None:
+            embed = discord.Embed(
+                title="🚫 Спам обнаружен",
+                description="Пользователь отправляет слишком много сообщений",
+                color=discord.Color.red(),
+                timestamp=datetime.datetime.now()
+            )
+            embed.add_field(name="Автор", value=message.author.mention, inline=True)
+            embed.add_field(name="Канал", value=message.channel.mention, inline=True)
+            
+            await self.send_security_alert(embed)
         
-        if self.config.get("auto_moderation", True):
+        if self.auto_moderation:
             await message.author.timeout(datetime.timedelta(minutes=5), reason="Spam detection")
     
     async def handle_invite(self, message: discord.Message):
-        embed = discord.Embed(
-            title="🔗 Приглашение обнаружено",
-            description="Пользователь отправил ссылку-приглашение",
-            color=discord.Color.orange(),
-            timestamp=datetime.datetime.now()
-        )
-        embed.add_field(name="Автор", value=message.author.mention, inline=True)
-        embed.add_field(name="Канал", value=message.channel.mention, inline=True)
-        
-        await self.send_security_alert(embed)
+        if self._log_channel is not None:
+            embed = discord.Embed(
+                title="🔗 Приглашение обнаружено",
+                description="Пользователь отправил ссылку-приглашение",
+                color=discord.Color.orange(),
+                timestamp=datetime.datetime.now()
+            )
+            embed.add_field(name="Автор", value=message.author.mention, inline=True)
+            embed.add_field(name="Канал", value=message.channel.mention, inline=True)
+            
+            await self.send_security_alert(embed)
         
-        if self.config.get("auto_moderation", True):
+        if self.auto_moderation:
             await message.delete()
             await message.author.timeout(datetime.timedelta(minutes=10), reason="Invite link")
     
     async def add_suspicion(self, user_id: int, reason: str, points: int):
-        if user_id not in self.suspicious_users:
-            self.suspicious_users[user_id] = {
-                "total_points": 0,
-                "reasons": [],
-                "recent_messages": []
-            }
+        user_data = self.suspicious_users.get(user_id)
+        if user_data is None:
+            user_data = self.suspicious_users[user_id] = UserSuspicion()
         
-        user_data = self.suspicious_users[user_id]
-        user_data["total_points"] += points
-        user_data["reasons"].append({
+        user_data.total_points += points
+        user_data.reasons.append({
             "reason": reason,
             "points": points,
-            "timestamp": datetime.datetime.now()
+            "timestamp": time.monotonic()
         })
         
-        if user_data["total_points"] >= self.config.get("suspicious_threshold", 3):
+        if user_data.total_points >= self.suspicious_threshold:
             await self.handle_high_suspicion(user_id, user_data)
     
-    async def handle_high_suspicion(self, user_id: int, user_data: dict):
+    async def handle_high_suspicion(self, user_id: int, user_data: UserSuspicion):
+        if self._log_channel is None:
+            return
+        
         embed = discord.Embed(
             title="🚨 Высокий уровень подозрений",
             description="Пользователь достиг критического уровня подозрений",
@@ -259,29 +339,27 @@ class XillenSecurityBot(commands.Bot):
         user = self.get_user(user_id)
         if user:
             embed.add_field(name="Пользователь", value=user.mention, inline=True)
-            embed.add_field(name="Очки подозрений", value=user_data["total_points"], inline=True)
+            embed.add_field(name="Очки подозрений", value=user_data.total_points, inline=True)
             
-            reasons = [r["reason"] for r in user_data["reasons"][-5:]]
+            recent_reasons = itertools.islice(user_data.reasons, max(0, len(user_data.reasons) - 5), len(user_data.reasons))
+            reasons = [r["reason"] for r in recent_reasons]
             embed.add_field(name="Последние причины", value=", ".join(reasons), inline=False)
         
         await self.send_security_alert(embed)
     
     async def send_security_alert(self, embed: discord.Embed):
-        log_channel_id = self.config.get("log_channel_id")
-        if log_channel_id:
+        if self._log_channel:
             try:
-                channel = self.get_channel(log_channel_id)
-                if channel:
-                    await channel.send(embed=embed)
+                await self._log_channel.send(embed=embed)
             except Exception as e:
                 self.logger.error(f"Failed to send security alert: {e}")
     
     async def log_security_event(self, event: SecurityEvent):
+        if len(self.security_events) == self.security_events.maxlen:
+            self._event_type_counts[self.security_events[0].event_type] -= 1
         self.security_events.append(event)
+        self._event_type_counts[event.event_type] += 1
         await self.db.log_event(event)
-        
-        if len(self.security_events) > 1000:
-            self.security_events = self.security_events[-1000:]
     
     async def log_message_event(self, message: discord.Message):
         await self.db.log_message(
@@ -309,9 +387,9 @@ class XillenSecurityBot(commands.Bot):
             pass
     
     async def check_new_member(self, member: discord.Member):
-        account_age = datetime.datetime.now() - member.created_at
+        account_age = discord.utils.utcnow() - member.created_at
         
-        if account_age.days < 7:
+        if account_age.days < 7 and self._log_channel is not None:
             embed = discord.Embed(
                 title="🆕 Новый аккаунт",
                 description="Обнаружен новый аккаунт Discord",
@@ -335,24 +413,31 @@ class XillenSecurityBot(commands.Bot):
             self.logger.error(f"Security scan failed: {e}")
     
     async def scan_guild_security(self, guild: discord.Guild):
-        total_members = guild.member_count
-        online_members = len([m for m in guild.members if m.status != discord.Status.offline])
+        total_members = guild.member_count or 0
+        if total_members <= 100 or self._log_channel is None:
+            return
         
-        if total_members > 0:
-            online_percentage = (online_members / total_members) * 100
-            
-            if online_percentage < 10 and total_members > 100:
-                embed = discord.Embed(
-                    title="📊 Низкая активность",
-                    description="Обнаружена низкая активность на сервере",
-                    color=discord.Color.yellow(),
-                    timestamp=datetime.datetime.now()
-                )
-                embed.add_field(name="Сервер", value=guild.name, inline=True)
-                embed.add_field(name="Онлайн", value=f"{online_members}/{total_members}", inline=True)
-                embed.add_field(name="Процент", value=f"{online_percentage:.1f}%", inline=True)
-                
-                await self.send_security_alert(embed)
+        online_limit = total_members / 10
+        online_members = 0
+        for member in guild.members:
+            if member.status is not discord.Status.offline:
+                online_members += 1
+                if online_members >= online_limit:
+                    return
+        
+        online_percentage = (online_members / total_members) * 100
+        
+        embed = discord.Embed(
+            title="📊 Низкая активность",
+            description="Обнаружена низкая активность на сервере",
+            color=discord.Color.yellow(),
+            timestamp=datetime.datetime.now()
+        )
+        embed.add_field(name="Сервер", value=guild.name, inline=True)
+        embed.add_field(name="Онлайн", value=f"{online_members}/{total_members}", inline=True)
+        embed.add_field(name="Процент", value=f"{online_percentage:.1f}%", inline=True)
+        
+        await self.send_security_alert(embed)
 
 class SecurityCommands(commands.Cog):
     def __init__(self, bot: XillenSecurityBot):
@@ -374,7 +459,8 @@ class SecurityCommands(commands.Cog):
         embed.add_field(name="Подозрительных пользователей", value=suspicious_users, inline=True)
         embed.add_field(name="Уровень безопасности", value=self.bot.config.get("security_level", "medium"), inline=True)
         
-        recent_events = self.bot.security_events[-5:] if self.bot.security_events else []
+        events = self.bot.security_events
+        recent_events = list(itertools.islice(events, max(0, len(events) - 5), len(events)))
         if recent_events:
             events_text = "\n".join([f"• {e.event_type}: {e.description[:50]}..." for e in recent_events])
             embed.add_field(name="Последние события", value=events_text, inline=False)
@@ -390,8 +476,8 @@ class SecurityCommands(commands.Cog):
             timestamp=datetime.datetime.now()
         )
         
-        user_data = self.bot.suspicious_users.get(member.id, {})
-        total_points = user_data.get("total_points", 0)
+        user_data = self.bot.suspicious_users.get(member.id) or UserSuspicion()
+        total_points = user_data.total_points
         
         embed.add_field(name="Пользователь", value=member.mention, inline=True)
         embed.add_field(name="Очки подозрений", value=total_points, inline=True)
@@ -406,8 +492,9 @@ class SecurityCommands(commands.Cog):
             embed.add_field(name="Статус", value="🚨 Опасен", inline=True)
             embed.color = discord.Color.red()
         
-        if user_data.get("reasons"):
-            reasons = [r["reason"] for r in user_data["reasons"][-3:]]
+        if user_data.reasons:
+            recent_reasons = itertools.islice(user_data.reasons, max(0, len(user_data.reasons) - 3), len(user_data.reasons))
+            reasons = [r["reason"] for r in recent_reasons]
             embed.add_field(name="Последние причины", value=", ".join(reasons), inline=False)
         
         await ctx.send(embed=embed)
@@ -478,7 +565,7 @@ class MonitoringCommands(commands.Cog):
             timestamp=datetime.datetime.now()
         )
         
-        recent_events = events[-limit:]
+        recent_events = itertools.islice(events, max(0, len(events) - limit), len(events))
         for event in recent_events:
             embed.add_field(
                 name=f"[{event.event_type}] {event.user_name}",
@@ -498,16 +585,13 @@ class MonitoringCommands(commands.Cog):
         )
         
         total_events = len(self.bot.security_events)
-        event_types = {}
-        
-        for event in self.bot.security_events:
-            event_types[event.event_type] = event_types.get(event.event_type, 0) + 1
         
         embed.add_field(name="Всего событий", value=total_events, inline=True)
         embed.add_field(name="Подозрительных пользователей", value=len(self.bot.suspicious_users), inline=True)
         
-        for event_type, count in sorted(event_types.items(), key=lambda x: x[1], reverse=True)[:5]:
-            embed.add_field(name=event_type, value=count, inline=True)
+        for event_type, count in self.bot._event_type_counts.most_common(5):
+            if count:
+                embed.add_field(name=event_type, value=count, inline=True)
         
         await ctx.send(embed=embed)
 
@@ -519,6 +603,8 @@ class AdminCommands(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def reload_config(self, ctx):
         self.bot.config = self.bot.load_config()
+        self.bot._apply_config()
+        self.bot.resolve_log_channel()
         await ctx.send("✅ Конфигурация перезагружена")
     
     @commands.command(name="clear_suspicion")
@@ -531,14 +617,36 @@ class AdminCommands(commands.Cog):
             await ctx.send(f"ℹ️ У {member.mention} нет подозрений")
 
 class Database:
+    INSERT_EVENT_SQL = '''
+        INSERT INTO security_events 
+        (timestamp, user_id, user_name, event_type, description, level, channel_id, message_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    INSERT_MESSAGE_SQL = '''
+        INSERT OR REPLACE INTO messages 
+        (id, user_id, user_name, channel_id, content, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+    _STOP = object()
+    
     def __init__(self):
         self.db_path = "xillen_security.db"
+        self.conn: Optional[aiosqlite.Connection] = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+        self.batch_size = 200
+        self.flush_interval = 0.1
     
     async def init(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self.conn = await aiosqlite.connect(self.db_path, isolation_level=None)
+        
+        await self.conn.execute("PRAGMA journal_mode=WAL")
+        await self.conn.execute("PRAGMA synchronous=NORMAL")
+        await self.conn.execute("PRAGMA temp_store=MEMORY")
+        await self.conn.execute("PRAGMA cache_size=-20000")
         
-        cursor.execute('''
+        await self.conn.execute('''
             CREATE TABLE IF NOT EXISTS security_events (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 timestamp TEXT NOT NULL,
@@ -552,7 +660,7 @@ class Database:
             )
         ''')
         
-        cursor.execute('''
+        await self.conn.execute('''
             CREATE TABLE IF NOT EXISTS messages (
                 id INTEGER PRIMARY KEY,
                 user_id INTEGER NOT NULL,
@@ -563,18 +671,23 @@ class Database:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        await self.conn.execute("CREATE INDEX IF NOT EXISTS idx_events_user_ts ON security_events(user_id, timestamp)")
+        await self.conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_user_ts ON messages(user_id, timestamp)")
+        
+        self._flusher_task = asyncio.create_task(self._flusher())
+    
+    async def close(self):
+        if self._flusher_task:
+            self._queue.put_nowait(self._STOP)
+            await self._flusher_task
+            self._flusher_task = None
+        
+        if self.conn:
+            await self.conn.close()
+            self.conn = None
     
     async def log_event(self, event: SecurityEvent):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO security_events 
-            (timestamp, user_id, user_name, event_type, description, level, channel_id, message_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        self._queue.put_nowait(("event", (
             event.timestamp.isoformat(),
             event.user_id,
             event.user_name,
@@ -583,37 +696,68 @@ class Database:
             event.level.value,
             event.channel_id,
             event.message_id
-        ))
-        
-        conn.commit()
-        conn.close()
+        )))
     
     async def log_message(self, message_id: int, user_id: int, user_name: str, 
                          channel_id: int, content: str, timestamp: datetime.datetime):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO messages 
-            (id, user_id, user_name, channel_id, content, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
+        self._queue.put_nowait(("message", (
             message_id,
             user_id,
             user_name,
             channel_id,
             content,
             timestamp.isoformat()
-        ))
+        )))
+    
+    def _drain(self, first: tuple) -> List[tuple]:
+        batch = [first]
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+    
+    async def _flusher(self):
+        stopping = False
+        while not stopping or not self._queue.empty():
+            first = await self._queue.get()
+            if first is not self._STOP and not stopping and self._queue.qsize() + 1 < self.batch_size:
+                await asyncio.sleep(self.flush_interval)
+            
+            batch = self._drain(first)
+            if any(item is self._STOP for item in batch):
+                stopping = True
+                batch = [item for item in batch if item is not self._STOP]
+            
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                logging.getLogger('XillenSecurityBot').error(f"Failed to flush {len(batch)} database rows: {e}")
+    
+    async def _flush(self, batch: List[tuple]):
+        if not batch:
+            return
         
-        conn.commit()
-        conn.close()
+        events_batch = [row for kind, row in batch if kind == "event"]
+        messages_batch = [row for kind, row in batch if kind == "message"]
+        
+        async with self._write_lock:
+            await self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if events_batch:
+                    await self.conn.executemany(self.INSERT_EVENT_SQL, events_batch)
+                if messages_batch:
+                    await self.conn.executemany(self.INSERT_MESSAGE_SQL, messages_batch)
+                await self.conn.execute("COMMIT")
+            except BaseException:
+                if self.conn.in_transaction:
+                    await self.conn.execute("ROLLBACK")
+                raise
 
 async def main():
     bot = XillenSecurityBot()
     
     try:
-        await bot.start(bot.config["token"])
+        async with bot:
+            await bot.start(bot.config["token"])
     except discord.LoginFailure:
         print("❌ Неверный токен бота!")
         print("Проверьте файл config.json и убедитесь, что токен указан правильно.")
@@ -621,5 +765,7 @@ async def main():
         print(f"❌ Ошибка запуска бота: {e}")
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())
 